@@ -1,86 +1,372 @@
 import reflex as rx
 from duckduckgo_search import DDGS
-from swarm import Swarm, Agent
+from dataclasses import dataclass
 from datetime import datetime
+from openai import OpenAI
 from dotenv import load_dotenv
+from functools import lru_cache, partial
+from operator import itemgetter
+import asyncio
+import atexit
+import hashlib
+import httpx
+import importlib.util
+import logging
 import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+# Optional semantic caching; sentence-transformers (and torch) are only
+# imported once the first embedding is needed
+HAS_EMBEDDER = importlib.util.find_spec("sentence_transformers") is not None
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Swarm and set model
+logger = logging.getLogger(__name__)
+
+# Set model; the OpenAI-compatible client and agents are built lazily on
+# first use so importing the app (and every worker fork) stays cheap
+
+MODEL = os.getenv("NEWS_AGENT_MODEL", "llama3.2-newsagent-q4km")
+MODEL_HIGH = os.getenv("NEWS_AGENT_SUMMARY_MODEL", "llama3.2-newsagent-q8")
+
+@dataclass(frozen=True)
+class Agent:
+    """A named system prompt bound to a model"""
+    name: str
+    instructions: str
+    model: str
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Create the OpenAI-compatible client on first use"""
+    # Share one keep-alive connection pool across all agent calls; HTTP/2 is
+    # negotiated when OPENAI_BASE_URL points at a TLS endpoint
+    http_client = httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60),
+    )
+    atexit.register(http_client.close)
+    return OpenAI(http_client=http_client)
 
-MODEL = "llama3.2"
-client = Swarm()
+# Run the standalone synthesis step only when debugging, to inspect its output
+DEBUG = os.getenv("NEWS_AGENT_DEBUG", "").lower() in ("1", "true", "yes")
 
 # Create specialized agents
-search_agent = Agent(
-    name="News Searcher",
-    instructions="""
-    You are an expert in news discovery. Your role involves:
-    1. Identifying the latest and most pertinent news articles on the provided topic.
-    2. Ensuring all sources are credible and trustworthy.
-    3. Presenting the raw search results in a clear and organized manner.
-    """,
-    model=MODEL
-)
+@lru_cache(maxsize=1)
+def get_synthesis_agent():
+    """Create the synthesis agent on first use"""
+    return Agent(
+        name="News Synthesizer",
+        instructions="""
+        Synthesize the articles in 2-3 paragraphs.
+        - Merge sources; keep key facts and figures.
+        - Facts only, neutral, professional tone.
+        """,
+        model=MODEL
+    )
 
-synthesis_agent = Agent(
-    name="News Synthesizer",
-    instructions="""
-    You are a specialist in news summarization. Your responsibilities include:
-    1. Reviewing the provided news articles thoroughly.
-    2. Extracting key insights and essential details.
-    3. Merging information from various sources into a unified summary.
-    4. Crafting a clear and concise overview that is both comprehensive and succinct in a 
-    professional and accessible tone.
-    5. Prioritizing factual accuracy and upholding journalistic neutrality.
-    6. Provide a synthesis of the main points in 2-3 paragraphs.
-    """,
-    model=MODEL
-)
+@lru_cache(maxsize=1)
+def get_summary_agent():
+    """Create the summary agent on first use"""
+    return Agent(
+        name="News Summarizer",
+        instructions="""
+        You write AP/Reuters-style news.
+        - Internally find key themes across the articles; do not output them.
+        - Lead with the main development, then key players, data, significance, short-term effects.
+        - Active voice, specifics, neutral, plain words.
+        Output ONLY one 250-400 word paragraph: [Main Event] + [Key Details/Data] + [Significance/Next Steps]. No labels or meta-comments.
+        """,
+        model=MODEL_HIGH
+    )
 
-summary_agent = Agent(
-    name="News Summarizer",
-    instructions="""
-    You are a skilled news summarizer, blending the precision of AP and Reuters with concise, modern storytelling.
-
-    Your Responsibilities:
-    1. Core Details:
-    - Start with the most critical news development.
-    - Highlight key players and their actions.
-    - Include significant data or figures where applicable.
-    - Explain its immediate relevance and importance.
-    - Outline potential short-term effects or implications.
-
-    2. Writing Style:
-    - Use clear, active language.
-    - Focus on specifics over generalities.
-    - Maintain a neutral, fact-based tone.
-    - Ensure each word adds value.
-    - Simplify complex terms for broader understanding.
-
-    Deliverable:
-
-    Compose a single, engaging paragraph (250-400 words) structured as follows:
-    [Main Event] + [Key Details/Data] + [Significance/Next Steps].
-
-    IMPORTANT NOTE: Deliver the paragraph as news content only, without labels, introductions, or meta-comments. Begin directly with the story.
-    """,
-    model=MODEL
-)
+RESULT_TEMPLATE = "Title: %s\nURL: %s\nSummary: %s"
+_result_fields = itemgetter("title", "href", "body")
 
-def search_news(topic):
+# Article bodies are cut to this many characters to keep prompts short
+MAX_BODY_CHARS = 300
+
+@lru_cache(maxsize=1)
+def month_suffix(year, month):
+    """Format the year-month suffix appended to search queries"""
+    return f"{year:04d}-{month:02d}"
+
+def format_result(result, full_bodies=False):
+    """Format one search result, truncating its body unless full bodies are requested"""
+    title, href, body = _result_fields(result)
+    return RESULT_TEMPLATE % (title, href, body if full_bodies else body[:MAX_BODY_CHARS])
+
+# Idle DuckDuckGo sessions, reused so searches keep their HTTPS connection;
+# a session is used by one thread at a time, so concurrent searches each take their own
+_ddgs_pool: queue.SimpleQueue = queue.SimpleQueue()
+
+def _close_ddgs_pool():
+    """Close all pooled DuckDuckGo sessions"""
+    while not _ddgs_pool.empty():
+        _ddgs_pool.get_nowait().__exit__(None, None, None)
+
+atexit.register(_close_ddgs_pool)
+
+def search_news(topic, full_bodies=False):
     """Search for news articles using DuckDuckGo"""
-    with DDGS() as ddg:
-        results = ddg.text(f"{topic} news {datetime.now().strftime('%Y-%m')}", max_results=3)
-        if results:
-            news_results = "\n\n".join([
-                f"Title: {result['title']}\nURL: {result['href']}\nSummary: {result['body']}" 
-                for result in results
-            ])
-            return news_results
-        return f"No news found for {topic}."
+    now = datetime.now()
+    query = f"{topic} news {month_suffix(now.year, now.month)}"
+    try:
+        ddg = _ddgs_pool.get_nowait()
+    except queue.Empty:
+        ddg = DDGS()
+    try:
+        results = ddg.text(query, max_results=3)
+    finally:
+        _ddgs_pool.put(ddg)
+    if results:
+        return "\n\n".join(format_result(result, full_bodies) for result in results)
+    return f"No news found for {topic}."
+
+# Recent search results by (topic, full_bodies): (timestamp, results)
+SEARCH_TTL = 60
+_search_cache: dict[tuple[str, bool], tuple[float, str]] = {}
+
+async def search_news_async(topic, full_bodies=False):
+    """Search for news off the event loop, reusing results from the last minute"""
+    key = (topic, full_bodies)
+    cached = _search_cache.get(key)
+    if cached and time.time() - cached[0] < SEARCH_TTL:
+        return cached[1]
+    results = await asyncio.to_thread(search_news, topic, full_bodies)
+    now = time.time()
+    # Evict expired entries so one-off topics don't accumulate
+    for expired in [k for k, (created, _) in _search_cache.items() if now - created >= SEARCH_TTL]:
+        del _search_cache[expired]
+    _search_cache[key] = (now, results)
+    return results
+
+# Static task prompts, sent as a system message ahead of the dynamic content
+# so the prompt prefix stays identical across requests and can be cached
+SYNTHESIS_PROMPT = "Synthesize the news articles in the next message."
+SUMMARY_PROMPT = "Summarize the news articles in the next message."
+UPDATE_PROMPT = "Update the news summary in the next message with the new facts that follow it, keeping its structure."
+
+# Response cache: exact prompts persist across restarts in SQLite, which is
+# safe to share between the Reflex backend and its workers; similar topics are
+# matched by embedding when sentence-transformers is installed
+CACHE_PATH = os.getenv(
+    "NEWS_AGENT_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".news_agent_cache.db"),
+)
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.95
+# Rows older than this are pruned whenever a new reply is stored
+CACHE_TTL = 7 * 24 * 60 * 60
+# A similar topic only reuses a reply while its search results would still be fresh
+SEMANTIC_TTL = SEARCH_TTL
+
+_cache_lock = threading.Lock()
+# Per (agent name, prompt): [(timestamp, topic embedding, reply)]
+_semantic_cache: dict[tuple[str, str], list[tuple[float, object, str]]] = {}
+
+@lru_cache(maxsize=1)
+def get_cache():
+    """Open the response cache database on first use"""
+    db = sqlite3.connect(CACHE_PATH, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+    db.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache (created)")
+    atexit.register(db.close)
+    return db
+
+def cache_get_entry(key, max_age=None):
+    """Return a cached (value, created) pair, or None if it is missing or older than max_age seconds"""
+    with _cache_lock:
+        row = get_cache().execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+    if row is None or (max_age is not None and time.time() - row[1] > max_age):
+        return None
+    return row
+
+def cache_get(key, max_age=None):
+    """Return a cached value, or None if it is missing or older than max_age seconds"""
+    entry = cache_get_entry(key, max_age)
+    return entry[0] if entry is not None else None
+
+def cache_set(key, value, created=None):
+    """Store a value in the response cache (stamped now unless created is given), pruning expired rows"""
+    now = time.time()
+    with _cache_lock:
+        db = get_cache()
+        db.execute("DELETE FROM cache WHERE created < ?", (now - CACHE_TTL,))
+        db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, value, created or now))
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """Load the sentence embedding model on first use"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+def cache_key(agent, prompt, content):
+    """Build the exact-match cache key for an agent call, covering the agent's model and instructions"""
+    digest = hashlib.blake2b(f"{agent.model}\n{agent.instructions}\n{prompt}\n{content}".encode()).hexdigest()
+    return f"{agent.name}:{digest}"
+
+def stream_run(agent, prompt, content, topic, semantic=True, on_generated=None):
+    """Stream an agent's reply to a static prompt and dynamic content, serving exact or (if semantic) semantically similar repeats from cache"""
+    key = cache_key(agent, prompt, content)
+    # cache_get releases the lock before returning, so a paused generator never holds it
+    hit = cache_get(key)
+    if hit is not None:
+        yield hit
+        return
+
+    embedding = None
+    semantic_key = (agent.name, prompt)
+    if semantic and HAS_EMBEDDER:
+        embedding = get_embedder().encode(topic, normalize_embeddings=True)
+        now = time.time()
+        with _cache_lock:
+            entries = list(_semantic_cache.get(semantic_key, []))
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        for created, cached_embedding, result in entries:
+            if now - created < SEMANTIC_TTL and float(embedding @ cached_embedding) > SEMANTIC_THRESHOLD:
+                yield result
+                return
+
+    parts = []
+    # The agents have no tools or hand-offs, so the endpoint is called directly
+    stream = get_client().chat.completions.create(
+        model=agent.model,
+        messages=[
+            {"role": "system", "content": agent.instructions},
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": content},
+        ],
+        stream=True
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+
+    result = "".join(parts)
+    cache_set(key, result)
+    # Cache hits returned above, so callers only see replies generated for this content
+    if on_generated is not None:
+        on_generated(result)
+    if embedding is not None:
+        now = time.time()
+        with _cache_lock:
+            entries = [entry for entry in _semantic_cache.get(semantic_key, []) if now - entry[0] < SEMANTIC_TTL]
+            entries.append((now, embedding, result))
+            _semantic_cache[semantic_key] = entries
+
+def cached_run(agent, prompt, content, topic):
+    """Run an agent to completion, see stream_run"""
+    return "".join(stream_run(agent, prompt, content, topic))
+
+# Topics that differ only in stopwords, word order or inflection share a
+# canonical form; a summary cached for one is updated rather than rewritten
+TOPIC_STOPWORDS = frozenset({
+    "a", "about", "an", "and", "for", "in", "latest", "new", "news", "of",
+    "on", "recent", "the", "to", "today", "update", "updates", "with",
+})
+
+@lru_cache(maxsize=1)
+def get_stemmer():
+    """Load nltk's Porter stemmer on first use"""
+    from nltk.stem import PorterStemmer
+    return PorterStemmer()
+
+# Templates first written longer ago than this are too stale to anchor an
+# update, and the summary is rewritten from scratch
+TEMPLATE_TTL = 24 * 60 * 60
+
+def canonicalize(topic: str) -> str:
+    """Normalize a topic to lowercase, stemmed, sorted keywords without stopwords"""
+    words = re.findall(r"\w+", topic.lower())
+    stemmer = get_stemmer()
+    return " ".join(sorted({stemmer.stem(word) for word in words if word not in TOPIC_STOPWORDS}))
+
+def summarize(raw_news, topic):
+    """Stream the summary for a topic, updating a recent summary of a structurally equivalent topic when one exists"""
+    agent = get_summary_agent()
+    canonical = canonicalize(topic)
+    template_key = f"template:{canonical}"
+    summary_key = cache_key(agent, SUMMARY_PROMPT, raw_news)
+    # An exact repeat is served by the summary cached for these search results
+    cached = cache_get(summary_key)
+    if cached is not None:
+        yield cached
+        return
+
+    template = cache_get_entry(template_key, max_age=TEMPLATE_TTL) if canonical else None
+
+    def store(summary):
+        # Only text generated for these results is written through; a reply
+        # borrowed from a similar topic must not outlive SEMANTIC_TTL
+        cache_set(summary_key, summary)
+        if canonical:
+            # Updates keep the template's timestamp, so TEMPLATE_TTL counts from
+            # the last from-scratch summary and update chains eventually restart
+            cache_set(template_key, summary, created=template[1] if template else None)
+
+    if template is not None:
+        # The template was written for this same topic, so the semantic tier
+        # would match it and hand back the old summary unchanged
+        yield from stream_run(agent, UPDATE_PROMPT, f"{template[0]}\n\nNew facts:\n{raw_news}", topic, semantic=False, on_generated=store)
+    else:
+        yield from stream_run(agent, SUMMARY_PROMPT, raw_news, topic, on_generated=store)
+
+# Minimum seconds between streamed UI updates, to avoid re-render storms
+STREAM_INTERVAL = 0.1
+
+# In-flight speculative search prefetches, keyed by client token: (topic, task)
+_prefetch_tasks: dict[str, tuple[str, asyncio.Task]] = {}
+
+def _forget_prefetch(token, task):
+    """Drop a finished prefetch; its results live on in the search cache"""
+    if token in _prefetch_tasks and _prefetch_tasks[token][1] is task:
+        del _prefetch_tasks[token]
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("News prefetch failed: %s", task.exception())
+
+async def _process_one(topic, full_bodies=False, search=None, on_update=None):
+    """Run the search and summary pipeline for one topic, awaiting on_update(field, value) as each step's output lands"""
+    async def update(field, value):
+        if on_update is not None:
+            await on_update(field, value)
+
+    # search is an already running fetch of the raw news, such as a prefetch
+    raw_news = await (search if search is not None else search_news_async(topic, full_bodies))
+    await update("raw_news", raw_news)
+
+    # Synthesize and summarize in a single summary agent call, streaming the
+    # paragraph to on_update at most every STREAM_INTERVAL seconds
+    chunks = summarize(raw_news, topic)
+    final_summary = ""
+    last_update = 0.0
+    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+        final_summary += chunk
+        if on_update is not None and time.monotonic() - last_update >= STREAM_INTERVAL:
+            await update("final_summary", final_summary)
+            last_update = time.monotonic()
+    await update("final_summary", final_summary)
+
+    # Intermediate synthesis is only computed for debugging
+    synthesized_news = ""
+    if DEBUG:
+        synthesized_news = await asyncio.to_thread(cached_run, get_synthesis_agent(), SYNTHESIS_PROMPT, raw_news, topic)
+        await update("synthesized_news", synthesized_news)
+
+    return {
+        "topic": topic,
+        "raw_news": raw_news,
+        "synthesized_news": synthesized_news,
+        "final_summary": final_summary,
+        "error": "",
+    }
 
 class State(rx.State):
     """Manage the application state."""
@@ -90,10 +376,14 @@ class State(rx.State):
     final_summary: str = ""
     is_loading: bool = False
     error_message: str = ""
+    full_bodies: bool = False
+    batch_topics: str = ""
+    batch_results: list[dict[str, str]] = []
+    is_batch_loading: bool = False
 
     @rx.event(background=True)
     async def process_news(self):
-        """Asynchronous news processing workflow using Swarm agents"""
+        """Asynchronous news processing workflow: DuckDuckGo search, then LLM agents"""
         # Reset previous state
         async with self:
 
@@ -106,30 +396,23 @@ class State(rx.State):
             yield
 
         try:
-            # Search news using search agent
-            search_response = client.run(
-                agent=search_agent,
-                messages=[{"role": "user", "content": f"Find recent news about {self.topic}"}]
-            )
-            async with self:
-                self.raw_news = search_response.messages[-1]["content"]
-            
-            # Synthesize using synthesis agent
-            synthesis_response = client.run(
-                agent=synthesis_agent,
-                messages=[{"role": "user", "content": f"Synthesize these news articles:\n{self.raw_news}"}]
-            )
-            async with self:
-                self.synthesized_news = synthesis_response.messages[-1]["content"]
-            
-            # Generate summary using summary agent
-            summary_response = client.run(
-                agent=summary_agent,
-                messages=[{"role": "user", "content": f"Summarize this synthesis:\n{self.synthesized_news}"}]
-            )
+            # Wait for a search still being prefetched for this topic; a finished
+            # prefetch is served by search_news_async's cache
+            search = None
+            prefetched = _prefetch_tasks.pop(self.router.session.client_token, None)
+            if prefetched and prefetched[0] == self.topic and not self.full_bodies:
+                search = prefetched[1]
+            elif prefetched:
+                prefetched[1].cancel()
+
+            async def update_state(field, value):
+                async with self:
+                    setattr(self, field, value)
+
+            # Stream each step's output into the UI as it is generated
+            await _process_one(self.topic, self.full_bodies, search, update_state)
 
             async with self:
-                self.final_summary = summary_response.messages[-1]["content"]
                 self.is_loading = False
 
         except Exception as e:
@@ -138,21 +421,63 @@ class State(rx.State):
                 self.error_message = f"An error occurred: {str(e)}"
                 self.is_loading = False
 
-    def update_topic(self, topic: str):
-        """Update the search topic"""
+    @rx.event(background=True)
+    async def process_news_batch(self, topics: list[str]):
+        """Process several topics concurrently, overlapping their searches and LLM calls"""
+        topics = [topic.strip() for topic in topics if topic.strip()]
+        async with self:
+            self.is_batch_loading = True
+            self.error_message = ""
+            self.batch_results = []
+
+        # A failing topic is reported in its own row instead of discarding the others
+        results = await asyncio.gather(
+            *(_process_one(topic, self.full_bodies) for topic in topics),
+            return_exceptions=True,
+        )
+        async with self:
+            self.batch_results = [
+                result if not isinstance(result, BaseException) else {
+                    "topic": topic,
+                    "raw_news": "",
+                    "synthesized_news": "",
+                    "final_summary": "",
+                    "error": f"An error occurred: {str(result)}",
+                }
+                for topic, result in zip(topics, results)
+            ]
+            self.is_batch_loading = False
+
+    async def update_topic(self, topic: str):
+        """Update the search topic and prefetch its news in the background"""
         self.topic = topic
+        token = self.router.session.client_token
+        previous = _prefetch_tasks.pop(token, None)
+        if previous:
+            previous[1].cancel()
+        if topic.strip():
+            task = asyncio.create_task(search_news_async(topic))
+            task.add_done_callback(partial(_forget_prefetch, token))
+            _prefetch_tasks[token] = (topic, task)
 
 def news_page() -> rx.Component:
     """Render the main news processing page"""
     return rx.box(
         rx.section(
             rx.heading("📰 News Agent", size="8"),
+            # Reflex debounces inputs with both value and on_change (300 ms), so
+            # update_topic and its prefetch fire once per typing pause
             rx.input(
                 placeholder="Enter news topic",
                 value=State.topic,
                 on_change=State.update_topic,
                 width="300px"
             ),
+            rx.checkbox(
+                "Use full article text",
+                checked=State.full_bodies,
+                on_change=State.set_full_bodies,
+            ),
             rx.button(
                 "Process News", 
                 on_click=State.process_news,
@@ -165,6 +490,29 @@ def news_page() -> rx.Component:
             gap="1rem",
         ),
 
+        # Intermediate Steps Section, revealed as each step lands
+        rx.cond(
+            State.raw_news != "",
+            rx.accordion.root(
+                rx.accordion.item(
+                    header="🔎 Search Results",
+                    content=rx.text(State.raw_news, white_space="pre-wrap"),
+                    value="raw_news",
+                ),
+                rx.cond(
+                    State.synthesized_news != "",
+                    rx.accordion.item(
+                        header="🧩 Synthesis",
+                        content=rx.text(State.synthesized_news, white_space="pre-wrap"),
+                        value="synthesized_news",
+                    ),
+                ),
+                collapsible=True,
+                type="multiple",
+                width="100%",
+            )
+        ),
+
         # Results Section
         rx.cond(
             State.final_summary != "",
@@ -177,6 +525,40 @@ def news_page() -> rx.Component:
             )
         ),
 
+        # Batch Section
+        rx.section(
+            rx.heading("🗂️ Batch Topics", size="4"),
+            rx.text_area(
+                placeholder="Enter one news topic per line",
+                value=State.batch_topics,
+                on_change=State.set_batch_topics,
+                width="300px"
+            ),
+            rx.button(
+                "Process Batch",
+                on_click=State.process_news_batch(State.batch_topics.split("\n")),
+                color_scheme="blue",
+                loading=State.is_batch_loading,
+                width="fit-content",
+            ),
+            rx.foreach(
+                State.batch_results,
+                lambda result: rx.vstack(
+                    rx.heading(result["topic"], size="3"),
+                    rx.cond(
+                        result["error"] != "",
+                        rx.text(result["error"], color_scheme="red"),
+                        rx.text(result["final_summary"]),
+                    ),
+                    spacing="2",
+                    width="100%"
+                )
+            ),
+            display="flex",
+            flex_direction="column",
+            gap="1rem",
+        ),
+
         spacing="4",
         max_width="800px",
         margin="auto",